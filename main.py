@@ -1,93 +1,89 @@
-import json
+import asyncio
 import os
-import random
-import time
-from functools import wraps
+from functools import lru_cache
 
-from cozepy import Coze, TokenAuth, COZE_CN_BASE_URL
+import msgspec
+from cozepy import AsyncCoze, AsyncTokenAuth, COZE_CN_BASE_URL
 from dotenv import load_dotenv
 
-from utils import save_file, generate_random_filename
+from utils import save_files_async, generate_random_filename, retry_with_exponential_backoff
 
 
-# 重试装饰器
-def retry_with_exponential_backoff(max_attempts=5, initial_delay=1, max_delay=180, exponential_base=2, jitter=True):
-    """
-    带有指数退避和抖动的重试装饰器
+# 工作流输出结构，只解析需要的字段
+class WorkflowOutput(msgspec.Struct):
+    output: str
 
-    参数:
-        max_attempts: 最大重试次数
-        initial_delay: 初始延迟时间（秒）
-        max_delay: 最大延迟时间（秒）
-        exponential_base: 指数基数
-        jitter: 是否添加随机抖动避免惊群效应
-    """
 
-    def decorator(func):
-        @wraps(func)
-        def wrapper(*args, **kwargs):
-            attempts = 0
-            while attempts < max_attempts:
-                try:
-                    return func(*args, **kwargs)
-                except Exception as err:
-                    attempts += 1
-                    if attempts == max_attempts:
-                        print(f"操作失败，已达到最大重试次数 {max_attempts}，最后一次异常: {str(err)}")
-                        raise
+workflow_output_decoder = msgspec.json.Decoder(WorkflowOutput)
 
-                    # 计算指数退避延迟
-                    delay = initial_delay * (exponential_base ** (attempts - 1))
 
-                    # 限制最大延迟
-                    delay = min(delay, max_delay)
+# initialize client
+@lru_cache(maxsize=1)
+def get_coze():
+    """首次调用时加载环境变量并创建客户端，之后复用同一个客户端"""
+    load_dotenv()
+    coze_api_token = os.getenv("COZE_API_TOKEN")
+    coze_api_base = COZE_CN_BASE_URL
+    return AsyncCoze(auth=AsyncTokenAuth(coze_api_token), base_url=coze_api_base)
 
-                    # 添加随机抖动（可选）
-                    if jitter:
-                        delay = delay * (0.5 + random.random())  # 在50%-150%之间随机
 
-                    print(f"操作失败: {str(err)}，{delay:.2f}秒后进行第{attempts + 1}次重试...")
-                    time.sleep(delay)
+@retry_with_exponential_backoff(max_attempts=5, initial_delay=15)
+async def create_workflow_run(_workflow_id):
+    """创建工作流运行，带有重试机制"""
+    return await get_coze().workflows.runs.create(workflow_id=_workflow_id)
 
-            return None
 
-        return wrapper
+async def generate_posts(workflow_ids):
+    """并发运行多个工作流，并将结果保存为文章"""
+    results = await asyncio.gather(
+        *(create_workflow_run(_workflow_id) for _workflow_id in workflow_ids),
+        return_exceptions=True
+    )
 
-    return decorator
+    items = []
+    for _workflow_id, ct in zip(workflow_ids, results):
+        if isinstance(ct, BaseException):
+            print(f"工作流 {_workflow_id} 执行失败: {str(ct)}")
+            continue
 
+        # 打印调试URL
+        print(f"工作流运行调试URL: {ct.debug_url}")
 
-# initialize client
-load_dotenv()
-coze_api_token = os.getenv("COZE_API_TOKEN")
-coze_api_base = COZE_CN_BASE_URL
-coze = Coze(auth=TokenAuth(coze_api_token), base_url=coze_api_base)
+        # 处理返回结果
+        if not ct.data:
+            print(f"工作流 {_workflow_id} 未返回结果")
+            continue
 
+        try:
+            output = workflow_output_decoder.decode(ct.data).output
+        except (msgspec.DecodeError, TypeError) as err:
+            print(f"工作流 {_workflow_id} 返回结果解析失败: {str(err)}")
+            continue
 
-@retry_with_exponential_backoff(max_attempts=5, initial_delay=15)
-def create_workflow_run(_workflow_id):
-    """创建工作流运行，带有重试机制"""
-    return coze.workflows.runs.create(workflow_id=_workflow_id)
+        file_name = generate_random_filename(extension="md")
+        items.append((f"content/posts/TrialRun/{file_name}", output))
+
+    # 保存结果到文件
+    for (file_path, _), (_success, error_msg) in zip(items, await save_files_async(items)):
+        if _success:
+            print(f"成功保存结果到文件: {file_path}")
+        else:
+            print(f"保存文件失败: {error_msg}")
 
 
-try:
-    # 获取工作流ID并创建运行实例，最多重试3次
-    workflow_id = os.getenv("WORKFLOW_ID")
-    if not workflow_id:
-        raise ValueError("环境变量中未找到WORKFLOW_ID")
+def main():
+    try:
+        # 获取工作流ID (多个ID以逗号分隔) 并发创建运行实例
+        load_dotenv()
+        workflow_ids = [_id.strip() for _id in os.getenv("WORKFLOW_ID", "").split(",") if _id.strip()]
+        if not workflow_ids:
+            raise ValueError("环境变量中未找到WORKFLOW_ID")
 
-    ct = create_workflow_run(workflow_id)
-    # 打印调试URL
-    debug_url = ct.debug_url
-    print(f"工作流运行调试URL: {debug_url}")
+        asyncio.run(generate_posts(workflow_ids))
 
-    # 处理返回结果
-    ct_data = json.loads(ct.data)
-    output = ct_data["output"]
+    except Exception as e:
+        print(f"执行失败: {str(e)}")
 
-    # 保存结果到文件
-    file_name = generate_random_filename(extension="md")
-    save_file(f"content/posts/TrialRun/{file_name}", output)
-    print(f"成功保存结果到文件: {file_name}")
 
-except Exception as e:
-    print(f"执行失败: {str(e)}")
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,99 @@
+import asyncio
+import errno
+import inspect
 import os
 import random
+import secrets
+import shutil
+import stat
 import string
 import time
-import uuid
+from functools import wraps
 from pathlib import Path
 from typing import Any
 from typing import Optional, Union
 
 
+# Path.exists() 视为"不存在"的stat错误 (包括符号链接循环)
+_STAT_MISSING_ERRNOS = frozenset({errno.ENOENT, errno.ENOTDIR, errno.EBADF, errno.ELOOP})
+
+# 流式复制文件对象时每次读取的大小
+_COPY_BUFSIZE = 64 * 1024
+
+# fdatasync 只同步数据，不支持的平台 (Windows/macOS) 退回 fsync
+_sync_data = getattr(os, 'fdatasync', os.fsync)
+
+
+# 字符集定义
+_CHARSETS = {
+    'alphanumeric': string.ascii_letters + string.digits,
+    'letters': string.ascii_letters,
+    'digits': string.digits,
+    'hex': string.hexdigits.lower(),
+    'safe': string.ascii_letters + string.digits + '_-'
+}
+
+# 从urlsafe base64结果中删除 '-' 和 '_'，得到纯字母数字
+_STRIP_URLSAFE = str.maketrans('', '', '-_')
+
+
+def _random_alphanumeric(length: int) -> str:
+    """用 secrets.token_urlsafe 生成字母数字随机串，去掉 '-' 和 '_' 后不足则补齐"""
+    result = ''
+    while len(result) < length:
+        result += secrets.token_urlsafe(length * 3 // 4 + 1).translate(_STRIP_URLSAFE)
+    return result[:length]
+
+
+# Windows和Unix的非法字符
+_ILLEGAL_CHARS = frozenset('<>:"/\\|?*')
+
+# 保留文件名 (Windows)
+_RESERVED_NAMES = frozenset({
+    'CON', 'PRN', 'AUX', 'NUL',
+    'COM1', 'COM2', 'COM3', 'COM4', 'COM5', 'COM6', 'COM7', 'COM8', 'COM9',
+    'LPT1', 'LPT2', 'LPT3', 'LPT4', 'LPT5', 'LPT6', 'LPT7', 'LPT8', 'LPT9'
+})
+
+# 各字符集对应的随机串生成函数，letters/digits 仍使用 random.choices
+_RANDOM_GENERATORS = {
+    'alphanumeric': _random_alphanumeric,
+    'hex': lambda n: secrets.token_hex((n + 1) // 2)[:n],
+    'safe': lambda n: secrets.token_urlsafe(n * 3 // 4 + 1)[:n],
+}
+
+
+def _write_to(f: Any, data: Any, durable: bool, encoding: str = 'utf-8') -> None:
+    """向已以二进制模式打开的文件写入字节类对象或文件对象的内容，文本文件对象按encoding编码，durable为True时写入后同步到磁盘"""
+    if hasattr(data, 'read'):
+        while chunk := data.read(_COPY_BUFSIZE):
+            if isinstance(chunk, str):
+                chunk = chunk.encode(encoding)
+            f.write(chunk)
+    else:
+        f.write(data)
+    if durable:
+        f.flush()
+        _sync_data(f.fileno())
+
+
+def _write_bytes(path: Path, data: Any, durable: bool, encoding: str = 'utf-8') -> None:
+    """以二进制模式打开文件并写入内容"""
+    with open(path, 'wb') as f:
+        _write_to(f, data, durable, encoding)
+
+
+def _sync_dir(directory: Path) -> None:
+    """同步目录到磁盘，使其中的重命名持久化 (仅POSIX，其他平台无法打开目录)"""
+    if os.name != 'posix':
+        return
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
 def save_file(
         file_path: Union[str, Path],
         content: Any,
@@ -15,19 +101,24 @@ def save_file(
         create_parent_dirs: bool = True,
         overwrite: bool = True,
         backup_existing: bool = False,
-        verbose: bool = False
+        verbose: bool = False,
+        durable: bool = False,
+        atomic: bool = True
 ) -> tuple[bool, Optional[str]]:
     """
     安全地保存文件内容到指定路径
 
     Args:
         file_path: 文件路径，可以是字符串或Path对象
-        content: 要保存的内容，可以是字符串、字节或可写入的对象
+        content: 要保存的内容，可以是字符串、字节类对象 (支持缓冲区协议的对象)、
+            可读取的文件对象 (二进制或文本) 或可转换为字符串的对象
         encoding: 文件编码，默认为utf-8
         create_parent_dirs: 是否自动创建父目录，默认为True
         overwrite: 是否覆盖已存在的文件，默认为True
         backup_existing: 当覆盖文件时是否创建备份，默认为False
         verbose: 是否打印详细信息，默认为False
+        durable: 写入后是否同步数据到磁盘 (fdatasync)，默认为False
+        atomic: 是否先写入临时文件再用os.replace原子替换目标文件，默认为True
 
     Returns:
         tuple[bool, Optional[str]]: (成功状态, 错误信息)
@@ -43,15 +134,23 @@ def save_file(
                 print(f"错误: {error_msg}")
             return False, error_msg
 
+        # 只调用一次stat获取路径状态，与Path.exists()一样把这些错误视为不存在
+        try:
+            path_stat = path.stat()
+        except OSError as e:
+            if e.errno not in _STAT_MISSING_ERRNOS:
+                raise
+            path_stat = None
+
         # 检查路径是否为目录
-        if path.exists() and path.is_dir():
+        if path_stat is not None and stat.S_ISDIR(path_stat.st_mode):
             error_msg = f"路径 '{path}' 是一个目录，不能保存文件"
             if verbose:
                 print(f"错误: {error_msg}")
             return False, error_msg
 
         # 检查文件是否已存在
-        if path.exists():
+        if path_stat is not None:
             if not overwrite:
                 error_msg = f"文件 '{path}' 已存在且不允许覆盖"
                 if verbose:
@@ -61,7 +160,11 @@ def save_file(
                 # 创建备份文件
                 backup_path = path.with_suffix(path.suffix + '.bak')
                 try:
-                    path.rename(backup_path)
+                    if atomic:
+                        # 原子写入时保留原文件直到替换完成
+                        shutil.copy2(path, backup_path)
+                    else:
+                        path.rename(backup_path)
                     if verbose:
                         print(f"已创建备份文件: {backup_path}")
                 except Exception as e:
@@ -86,30 +189,61 @@ def save_file(
                     print(f"错误: {error_msg}")
                 return False, error_msg
 
-        # 准备写入内容
-        write_content = content
+        # 准备写入内容，统一编码为字节后以二进制模式写入
+        text = None
         if isinstance(content, str):
-            # 字符串内容
-            mode = 'w'
-        elif isinstance(content, bytes):
-            # 字节内容
-            mode = 'wb'
-            encoding = None  # 字节模式不需要编码
+            text = content
+        elif hasattr(content, 'read'):
+            # 文件对象，写入时流式复制
+            write_content = content
         else:
-            # 其他类型尝试转换为字符串
             try:
-                write_content = str(content)
-                mode = 'w'
-            except Exception as e:
-                error_msg = f"无法处理内容类型: {type(content)}, 错误: {e}"
+                # 支持缓冲区协议的字节类对象，直接写入
+                memoryview(content)
+                write_content = content
+            except TypeError:
+                try:
+                    # 其他类型尝试转换为字符串
+                    text = str(content)
+                except Exception as e:
+                    error_msg = f"无法处理内容类型: {type(content)}, 错误: {e}"
+                    if verbose:
+                        print(f"错误: {error_msg}")
+                    return False, error_msg
+
+        if text is not None:
+            try:
+                write_content = text.encode(encoding)
+            except (UnicodeEncodeError, LookupError) as e:
+                error_msg = f"编码错误 (尝试使用不同的编码): {e}"
                 if verbose:
                     print(f"错误: {error_msg}")
                 return False, error_msg
 
         # 写入文件
         try:
-            with open(path, mode, encoding=encoding) as f:
-                f.write(write_content)
+            # 设备文件、管道等非普通文件不能被替换，只能直接写入
+            if atomic and (path_stat is None or stat.S_ISREG(path_stat.st_mode)):
+                # 符号链接替换其指向的文件，而不是链接本身
+                target = Path(os.path.realpath(path))
+                # 临时文件名保持较短，避免长文件名超出文件系统限制
+                tmp_path = target.with_name(f".{secrets.token_hex(4)}.tmp")
+                # 在try之外创建临时文件，创建失败时不会删除其他写入者的同名文件
+                tmp_file = open(tmp_path, 'xb')
+                try:
+                    with tmp_file:
+                        _write_to(tmp_file, write_content, durable, encoding)
+                    if path_stat is not None:
+                        # 保留原文件的权限
+                        os.chmod(tmp_path, stat.S_IMODE(path_stat.st_mode))
+                    os.replace(tmp_path, target)
+                except BaseException:
+                    tmp_path.unlink(missing_ok=True)
+                    raise
+                if durable:
+                    _sync_dir(target.parent)
+            else:
+                _write_bytes(path, write_content, durable, encoding=encoding)
             if verbose:
                 print(f"文件保存成功: {path}")
             return True, None
@@ -119,7 +253,7 @@ def save_file(
             if verbose:
                 print(f"错误: {error_msg}")
             return False, error_msg
-        except UnicodeEncodeError as e:
+        except (UnicodeEncodeError, LookupError) as e:
             error_msg = f"编码错误 (尝试使用不同的编码): {e}"
             if verbose:
                 print(f"错误: {error_msg}")
@@ -157,7 +291,30 @@ def save_file_with_retry(
     Returns:
         tuple[bool, Optional[str]]: (成功状态, 错误信息)
     """
+    # 文件对象在每次重试前回到起始位置，无法定位的只读取一次到内存中
+    start_pos = None
+    if hasattr(content, 'read'):
+        try:
+            seekable = getattr(content, 'seekable', None)
+            if seekable is not None and hasattr(content, 'tell') and hasattr(content, 'seek') and seekable():
+                start_pos = content.tell()
+            else:
+                content = content.read()
+        except (OSError, ValueError) as e:
+            error_msg = f"读取文件内容时出错: {e}"
+            if verbose:
+                print(f"错误: {error_msg}")
+            return False, error_msg
+
     for attempt in range(max_attempts):
+        if start_pos is not None:
+            try:
+                content.seek(start_pos)
+            except (OSError, ValueError) as e:
+                error_msg = f"读取文件内容时出错: {e}"
+                if verbose:
+                    print(f"错误: {error_msg}")
+                return False, error_msg
         _success, error_msg = save_file(file_path, content, verbose=verbose, **kwargs)
         if _success:
             return True, None
@@ -171,6 +328,25 @@ def save_file_with_retry(
     return False, final_error
 
 
+async def save_files_async(
+        items: list[tuple[Union[str, Path], Any]],
+        **kwargs
+) -> list[tuple[bool, Optional[str]]]:
+    """
+    并发保存多个文件，每个文件在线程池中调用save_file
+
+    Args:
+        items: (文件路径, 文件内容) 列表
+        **kwargs: 传递给save_file的其他参数
+
+    Returns:
+        list[tuple[bool, Optional[str]]]: 与items顺序对应的 (成功状态, 错误信息) 列表
+    """
+    return await asyncio.gather(
+        *(asyncio.to_thread(save_file, file_path, content, **kwargs) for file_path, content in items)
+    )
+
+
 def save_file_silent(
         file_path: Union[str, Path],
         content: Any,
@@ -191,6 +367,27 @@ def save_file_silent(
     return _success
 
 
+def _validate_directory(directory: Union[str, Path]) -> Path:
+    """
+    验证目录存在且是目录
+
+    Args:
+        directory: 要验证的目录
+
+    Returns:
+        Path: 目录的Path对象
+
+    Raises:
+        ValueError: 目录不存在或不是目录时
+    """
+    target_dir = Path(directory)
+    if not target_dir.exists():
+        raise ValueError(f"目录不存在: {directory}")
+    if not target_dir.is_dir():
+        raise ValueError(f"路径不是目录: {directory}")
+    return target_dir
+
+
 def generate_random_filename(
         extension: Optional[str] = None,
         length: int = 12,
@@ -199,7 +396,8 @@ def generate_random_filename(
         directory: Optional[Union[str, Path]] = None,
         max_attempts: int = 10,
         charset: str = "alphanumeric",
-        timestamp: bool = False
+        timestamp: bool = False,
+        existing_names: Optional[set[str]] = None
 ) -> str:
     """
     生成随机文件名，确保在目标目录中不重复
@@ -213,6 +411,9 @@ def generate_random_filename(
         max_attempts: 最大尝试次数，防止无限循环
         charset: 字符集类型 ('alphanumeric', 'letters', 'digits', 'hex', 'safe')
         timestamp: 是否包含时间戳
+        existing_names: 已存在的文件名集合 (元素为 casefold 后的文件名)，提供时用集合查找代替
+            逐个检查文件是否存在，按不区分大小写比较以兼容 Windows/macOS 等大小写不敏感的文件系统，
+            生成的文件名会加入该集合
 
     Returns:
         str: 生成的随机文件名
@@ -233,39 +434,24 @@ def generate_random_filename(
         extension = extension.strip().lstrip('.')
         if not extension:
             raise ValueError("扩展名不能为空字符串")
-        if any(c in extension for c in r'<>:"/\|?*'):
+        if not _ILLEGAL_CHARS.isdisjoint(extension):
             raise ValueError(f"扩展名包含非法字符: {extension}")
 
     # 验证目录
-    target_dir = None
-    if directory is not None:
-        target_dir = Path(directory)
-        if not target_dir.exists():
-            raise ValueError(f"目录不存在: {directory}")
-        if not target_dir.is_dir():
-            raise ValueError(f"路径不是目录: {directory}")
-
-    # 定义字符集
-    charsets = {
-        'alphanumeric': string.ascii_letters + string.digits,
-        'letters': string.ascii_letters,
-        'digits': string.digits,
-        'hex': string.hexdigits.lower(),
-        'safe': string.ascii_letters + string.digits + '_-'
-    }
-
-    if charset not in charsets:
-        raise ValueError(f"不支持的字符集类型: {charset}，可选: {list(charsets.keys())}")
-
-    charset_str = charsets[charset]
+    target_dir = _validate_directory(directory) if directory is not None else None
+
+    if charset not in _CHARSETS:
+        raise ValueError(f"不支持的字符集类型: {charset}，可选: {list(_CHARSETS.keys())}")
+
+    charset_str = _CHARSETS[charset]
+    generator = _RANDOM_GENERATORS.get(charset)
 
     # 生成文件名
     for attempt in range(max_attempts):
         try:
             # 生成随机部分
-            if charset == 'hex':
-                # 使用UUID生成更随机的十六进制字符串
-                random_part = uuid.uuid4().hex[:length]
+            if generator is not None:
+                random_part = generator(length)
             else:
                 random_part = ''.join(random.choices(charset_str, k=length))
 
@@ -295,7 +481,12 @@ def generate_random_filename(
                 continue
 
             # 检查是否已存在
-            if target_dir is not None:
+            if existing_names is not None:
+                name_key = filename.casefold()
+                if name_key in existing_names:
+                    continue
+                existing_names.add(name_key)
+            elif target_dir is not None:
                 file_path = target_dir / filename
                 if file_path.exists():
                     continue
@@ -324,23 +515,15 @@ def is_valid_filename(filename: str) -> bool:
     if not filename or filename.strip() == "":
         return False
 
-    # Windows和Unix的非法字符
-    illegal_chars = r'<>:"/\|?*'
-
     # 检查非法字符
-    if any(char in filename for char in illegal_chars):
+    if not _ILLEGAL_CHARS.isdisjoint(filename):
         return False
 
-    # 检查保留文件名 (Windows)
-    reserved_names = {
-        'CON', 'PRN', 'AUX', 'NUL',
-        'COM1', 'COM2', 'COM3', 'COM4', 'COM5', 'COM6', 'COM7', 'COM8', 'COM9',
-        'LPT1', 'LPT2', 'LPT3', 'LPT4', 'LPT5', 'LPT6', 'LPT7', 'LPT8', 'LPT9'
-    }
-
-    name_without_ext = Path(filename).stem.upper()
-    if name_without_ext in reserved_names:
-        return False
+    # 检查保留文件名 (Windows)，保留名都以 C/P/A/N/L 开头，其他文件名直接跳过
+    if filename[0].upper() in 'CPANL':
+        name_without_ext = filename.rsplit('.', 1)[0].upper()
+        if name_without_ext in _RESERVED_NAMES:
+            return False
 
     # 检查文件名长度 (考虑不同文件系统的限制)
     if len(filename) > 255:  # 常见文件系统的限制
@@ -372,6 +555,38 @@ def generate_multiple_filenames(
     if count <= 0:
         raise ValueError("数量必须为正整数")
 
+    return _generate_random_filename_bulk(count, extension=extension, **kwargs)
+
+
+def _generate_random_filename_bulk(
+        count: int,
+        extension: Optional[str] = None,
+        directory: Optional[Union[str, Path]] = None,
+        **kwargs
+) -> list[str]:
+    """
+    批量生成随机文件名，目标目录只用 os.scandir 读取一次，之后在内存中检查重名
+
+    Args:
+        count: 要生成的文件名数量
+        extension: 文件扩展名
+        directory: 目标目录，用于检查文件名是否已存在
+        **kwargs: 传递给generate_random_filename的参数
+
+    Returns:
+        list[str]: 生成的随机文件名列表
+    """
+    existing_names = kwargs.pop('existing_names', None)
+    if directory is not None:
+        try:
+            target_dir = _validate_directory(directory)
+            if existing_names is None:
+                with os.scandir(target_dir) as entries:
+                    existing_names = {entry.name.casefold() for entry in entries}
+        except Exception as e:
+            # 与逐个生成时的异常保持一致
+            raise RuntimeError(f"生成第 1 个文件名时出错: {e}") from e
+
     filenames = []
     for i in range(count):
         try:
@@ -382,7 +597,11 @@ def generate_multiple_filenames(
             else:
                 kwargs_with_suffix['suffix'] = str(i + 1)
 
-            filename = generate_random_filename(extension=extension, **kwargs_with_suffix)
+            filename = generate_random_filename(
+                extension=extension,
+                existing_names=existing_names,
+                **kwargs_with_suffix
+            )
             filenames.append(filename)
         except Exception as e:
             raise RuntimeError(f"生成第 {i + 1} 个文件名时出错: {e}") from e
@@ -417,3 +636,72 @@ def generate_temp_filename(
         directory=temp_dir,
         **kwargs
     )
+
+
+# 重试装饰器
+def retry_with_exponential_backoff(max_attempts=5, initial_delay=1, max_delay=180, exponential_base=2, jitter=True):
+    """
+    带有指数退避和抖动的重试装饰器，同时支持同步函数和异步函数
+
+    参数:
+        max_attempts: 最大重试次数
+        initial_delay: 初始延迟时间（秒）
+        max_delay: 最大延迟时间（秒）
+        exponential_base: 指数基数 (不使用抖动时生效)
+        jitter: 是否使用去相关抖动 (decorrelated jitter) 避免惊群效应
+    """
+
+    def next_delay(attempts, err, prev_delay):
+        """处理第 attempts 次失败，返回下次重试前的延迟；达到最大重试次数时重新抛出异常"""
+        if attempts == max_attempts:
+            print(f"操作失败，已达到最大重试次数 {max_attempts}，最后一次异常: {str(err)}")
+            raise err
+
+        if jitter:
+            # 去相关抖动：在初始延迟和上次延迟的3倍之间随机取值
+            delay = random.uniform(initial_delay, prev_delay * 3)
+        else:
+            # 计算指数退避延迟
+            delay = initial_delay * (exponential_base ** (attempts - 1))
+
+        # 限制最大延迟
+        delay = min(delay, max_delay)
+
+        print(f"操作失败: {str(err)}，{delay:.2f}秒后进行第{attempts + 1}次重试...")
+        return delay
+
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                attempts = 0
+                delay = initial_delay
+                while attempts < max_attempts:
+                    try:
+                        return await func(*args, **kwargs)
+                    except Exception as err:
+                        attempts += 1
+                        delay = next_delay(attempts, err, delay)
+                        await asyncio.sleep(delay)
+
+                return None
+
+            return async_wrapper
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            attempts = 0
+            delay = initial_delay
+            while attempts < max_attempts:
+                try:
+                    return func(*args, **kwargs)
+                except Exception as err:
+                    attempts += 1
+                    delay = next_delay(attempts, err, delay)
+                    time.sleep(delay)
+
+            return None
+
+        return wrapper
+
+    return decorator